@@ -2,11 +2,27 @@ import logging
 import requests
 import io
 import re
-from datetime import datetime, timedelta
-
-from pdfminer.high_level import extract_text
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Terugval op pdfminer als pypdfium2 ontbreekt
+    pdfium = None
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.const import CONF_NAME, CONF_URL
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
 
 _LOGGER = logging.getLogger(__name__)
 DOMAIN = "engie_gas"
@@ -15,16 +31,205 @@ DOMAIN = "engie_gas"
 # hoeven te vragen. In de eerste vijf dagen van een nieuwe maand proberen we
 # dagelijks op nieuwe gegevens te controleren. Zodra de prijzen voor de huidige
 # maand zijn opgehaald of de eerste week voorbij is, beperken we de verzoeken
-# tot maximaal één keer per week totdat de maand verandert.
-_CACHE = None
-_LAST_FETCH_ATTEMPT = None
-_LAST_SUCCESS_MONTH = None
-
-# Home Assistant roept ``update`` standaard iedere 30 seconden aan. Door een
-# scan interval van een dag te definiëren beperken we dit tot maximaal één
-# aanroep per dag.
+# tot maximaal één keer per week totdat de maand verandert. Alles wordt per URL
+# bijgehouden. Per URL is er een lock, zodat dezelfde PDF niet gelijktijdig
+# wordt opgehaald terwijl verschillende URL's elkaar niet blokkeren. ``_LOCK``
+# wordt enkel kort vastgehouden om de gedeelde dictionaries bij te werken.
+_CACHE = {}
+_LAST_FETCH_ATTEMPT = {}  # ``time.monotonic()`` van de laatste geslaagde fetch
+_LAST_SUCCESS_MONTH = {}
+_LOCK = threading.Lock()
+_URL_LOCKS = {}
+
+# ETag en Last-Modified van de laatst geparste PDF. Hiermee vragen we de PDF
+# voorwaardelijk op, zodat de server met ``304 Not Modified`` kan antwoorden
+# zolang de PDF niet gewijzigd is.
+_ETAG = {}
+_LAST_MODIFIED = {}
+
+# Volledig opgehaalde maanden worden bewaard in ``.storage/engie_gas_cache``,
+# zodat een herstart van Home Assistant niet opnieuw een download vereist.
+_STORE_KEY = f"{DOMAIN}_cache"
+_STORE_VERSION = 1
+
+# De coordinator van elke config entry roept ``parse_pdf`` hooguit één keer per
+# dag aan; de zes sensoren lezen vervolgens allemaal dezelfde gegevens.
 SCAN_INTERVAL = timedelta(days=1)
 
+# Eén gedeelde sessie zodat de TCP/TLS-verbinding hergebruikt wordt. Tijdelijke
+# serverfouten worden enkele keren opnieuw geprobeerd en de timeout voorkomt dat
+# een hangende server de update eindeloos blokkeert.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+    ),
+)
+_REQUEST_TIMEOUT = (5, 30)
+# Speling op het fetch-interval, zodat een coordinator-update die enkele
+# seconden te vroeg valt de dagelijkse of wekelijkse poging niet overslaat.
+_INTERVAL_TOLERANCE = 60
+
+# De sensortypes komen overeen met de keys die ``parse_pdf`` teruggeeft.
+_VALID_TYPES = frozenset({
+    "maandelijkse_prijs",
+    "fluvius_zenne_dijle_afname",
+    "fluvius_zenne_dijle_vergoeding",
+    "energiebijdrage",
+    "verbruik_0_12000",
+    "totaal",
+})
+
+# Bit per waarde die meetelt voor het totaal (de FLUVIUS-vergoeding is een
+# jaarlijks bedrag en telt niet mee).
+_TOTAAL_BITS = {
+    "maandelijkse_prijs": 0b0001,
+    "fluvius_zenne_dijle_afname": 0b0010,
+    "energiebijdrage": 0b0100,
+    "verbruik_0_12000": 0b1000,
+}
+_TOTAAL_MASK = 0b1111
+
+# Teksten die op de pagina's met de gezochte tabellen staan. Zodra ze allemaal
+# gevonden zijn, hoeven de overige pagina's niet meer geëxtraheerd te worden.
+_ANCHORS = ("Maandelijkse prijzen", "FLUVIUS ZENNE-DIJLE", "Toeslagen")
+
+# Gebieden in de huidige Engie-PDF waarin de gezochte tabellen staan, als
+# (pagina, (links, onder, rechts, boven)) in PDF-punten. pypdfium2 haalt eerst
+# enkel de tekst binnen deze gebieden op; lukt dat niet, dan volgt de volledige
+# pagina.
+_TEXT_REGIONS = (
+    (0, (20, 120, 580, 460)),
+    (1, (20, 555, 300, 660)),
+)
+
+# Reguliere expressies voor het parsen van de PDF-tekst, eenmalig gecompileerd.
+# ``_RE_ALL`` zoekt alle blokken in één doorloop van de tekst; de naam van de
+# buitenste groep (``lastgroup``) geeft aan welk blok gevonden werd. Van het
+# toeslagen-blok wordt enkel de titel gematcht, de getallen volgen erna. De
+# blokken zijn begrensd tot ``_BLOCK_WINDOW`` tekens, zodat een afwijkende PDF
+# niet tot een scan over de volledige tekst per ankerpunt leidt.
+_BLOCK_WINDOW = 2000
+_FLZ_ROW = r'FLUVIUS ZENNE-DIJLE(?P<flz_waarden>(?:[ \t]+\d+,\d+){8})'
+_RE_ALL = re.compile(
+    "|".join((
+        r'(?P<mp>Maandelijkse prijzen\s*\n\s*(?P<mp_waarde>[\d,]+))',
+        r'(?P<flz>%s)' % _FLZ_ROW,
+        r'(?P<flz_blok>FLUVIUS ANTWERPEN.{0,%d}?(?=Samenstelling))' % _BLOCK_WINDOW,
+        r'(?P<ts>Toeslagen\s*\([^)]*\))',
+    )),
+    re.DOTALL,
+)
+# ``finditer`` geeft geen overlappende matches: valt de rij binnen een gevonden
+# ``flz_blok``, dan zoeken we ze daar opnieuw.
+_RE_FLZ_ROW = re.compile(_FLZ_ROW)
+_RE_NETBEHEERDER = re.compile(r'FLUVIUS [A-Z-]+')
+_COMMA_DOT = str.maketrans(',', '.')
+_RE_DECIMAL = re.compile(r'\d+,\d+')
+_RE_NUMLINES = re.compile(r'(?m)(?:^|[^\S\n])([\d,]+)[^\S\n]*$')
+
+
+def _to_float(value):
+    """Zet een getal met decimale komma (zoals ``4,144``) om naar een float."""
+    return float(value.translate(_COMMA_DOT))
+
+
+def _extract_regions(pdf):
+    """Haal met pypdfium2 enkel de tekst binnen ``_TEXT_REGIONS`` op."""
+    if len(pdf) <= max(index for index, _ in _TEXT_REGIONS):
+        return None
+    parts = []
+    for index, (left, bottom, right, top) in _TEXT_REGIONS:
+        textpage = pdf[index].get_textpage()
+        parts.append(textpage.get_text_bounded(left=left, bottom=bottom, right=right, top=top))
+    return "\n".join(parts)
+
+
+def _scan_blocks(text):
+    """Zoek alle blokken in één scan; per blok onthouden we de eerste match."""
+    matches = {}
+    for match in _RE_ALL.finditer(text):
+        matches.setdefault(match.lastgroup, match)
+    return matches
+
+
+def _toeslagen_numbers(text, toeslagen_match):
+    """Geef de getallen in het venster na de titel van het toeslagen-blok terug.
+
+    Bij pdfminer staan ze op een eigen lijn, bij pypdfium2 achter het
+    bijhorende label; in beide gevallen eindigt de lijn op het getal.
+    """
+    start = toeslagen_match.end()
+    return _RE_NUMLINES.findall(text[start:start + _BLOCK_WINDOW])
+
+
+def _has_all_blocks(text, matches):
+    """Controleer of alle blokken die ``parse_pdf`` nodig heeft in de tekst staan."""
+    toeslagen_match = matches.get("ts")
+    return (
+        "mp" in matches
+        and ("flz" in matches or "flz_blok" in matches)
+        and toeslagen_match is not None
+        and len(_toeslagen_numbers(text, toeslagen_match)) >= 2
+    )
+
+
+def _extract_text(pdf_bytes):
+    """Haal de tekst uit de PDF, bij voorkeur via het snellere pypdfium2.
+
+    pypdfium2 geeft tabellen rij per rij terug, pdfminer kolom per kolom. De
+    parser in ``parse_pdf`` kan met beide indelingen overweg. De pagina's
+    worden één voor één geëxtraheerd tot alle ``_ANCHORS`` gevonden zijn;
+    ontbreekt er een, dan wordt zo toch het volledige document gelezen. Met
+    pypdfium2 wordt eerst enkel de tekst in ``_TEXT_REGIONS`` geprobeerd.
+
+    Geeft de tekst terug samen met de blokken uit ``_scan_blocks``.
+    """
+    missing = set(_ANCHORS)
+
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            text = _extract_regions(pdf)
+            if text:
+                matches = _scan_blocks(text)
+                if _has_all_blocks(text, matches):
+                    return text, matches
+            _LOGGER.debug("Tabellen niet gevonden in de verwachte gebieden, volledige pagina's worden gelezen.")
+
+            pages = []
+            for page in pdf:
+                page_text = page.get_textpage().get_text_bounded()
+                pages.append(page_text)
+                missing = {anchor for anchor in missing if anchor not in page_text}
+                if not missing:
+                    break
+            text = "\n".join(pages)
+            return text, _scan_blocks(text)
+        finally:
+            pdf.close()
+
+    # Zelfde werkwijze als ``pdfminer.high_level.extract_text``, maar pagina
+    # per pagina zodat we vroegtijdig kunnen stoppen. ``BytesIO`` deelt de
+    # buffer van ``pdf_bytes`` zolang er niet in geschreven wordt en heeft
+    # niets om af te sluiten.
+    with io.StringIO() as output:
+        rsrcmgr = PDFResourceManager()
+        device = TextConverter(rsrcmgr, output, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.get_pages(io.BytesIO(pdf_bytes)):
+            start = output.tell()
+            interpreter.process_page(page)
+            page_text = output.getvalue()[start:]
+            missing = {anchor for anchor in missing if anchor not in page_text}
+            if not missing:
+                break
+        text = output.getvalue()
+        return text, _scan_blocks(text)
+
 
 def parse_pdf(url):
     """Download de PDF, extraheer de tekst en parse de gewenste waarden.
@@ -44,149 +249,312 @@ def parse_pdf(url):
       - totaal  (berekend als maandelijkse_prijs + fluvius_zenne_dijle_afname +
                  energiebijdrage + verbruik_0_12000)
     """
-    global _CACHE, _LAST_FETCH_ATTEMPT, _LAST_SUCCESS_MONTH
-
-    now = datetime.utcnow()
-    current_month = (now.year, now.month)
-
-    # Als we al data voor de huidige maand hebben, gebruik deze dan.
-    if _CACHE is not None and _LAST_SUCCESS_MONTH == current_month:
-        return _CACHE
-
-    # Bepaal het minimale interval tussen fetches: dagelijks in de eerste vijf
-    # dagen van de maand, daarna maximaal wekelijks.
-    min_interval = timedelta(days=1) if now.day <= 5 else timedelta(days=7)
-
-    if _LAST_FETCH_ATTEMPT and (now - _LAST_FETCH_ATTEMPT) < min_interval:
-        return _CACHE
-
-    _LAST_FETCH_ATTEMPT = now
-
-    result = {}
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        pdf_bytes = response.content
-
-        with io.BytesIO(pdf_bytes) as pdf_file:
-            text = extract_text(pdf_file)
-
-        if not text:
-            _LOGGER.error("Geen tekst gevonden in de PDF.")
-            return _CACHE
-
-        _LOGGER.debug("Extracted text: %s", text)
-
-        # Maandelijkse prijs: zoekt naar "Maandelijkse prijzen" gevolgd door een regel met getal
-        m_price = re.search(r'Maandelijkse prijzen\s*\n\s*([\d,]+)', text)
-        if m_price:
-            try:
-                result["maandelijkse_prijs"] = float(m_price.group(1).replace(',', '.'))
-            except ValueError:
-                _LOGGER.error("Kon de maandelijkse prijs niet omzetten: %s", m_price.group(1))
-        else:
-            _LOGGER.error("Geen maandelijkse prijs gevonden.")
-
-        # FLUVIUS ZENNE-DIJLE: de tabel vermeldt eerst alle netbeheerders en
-        # daarna per kolom de waarden (één per netbeheerder). We zoeken daarom
-        # naar het volledige blok met de acht FLUVIUS-netbeheerders en delen de
-        # daaropvolgende getallen in even grote stukken op.
-        flz_block = re.search(r'(FLUVIUS ANTWERPEN.*?)(?=Samenstelling)', text, re.S)
-        if flz_block:
-            block_text = flz_block.group(1)
-            netbeheerders = re.findall(r'FLUVIUS [A-Z-]+', block_text)
-            if netbeheerders:
+    with _url_lock(url):
+        now = datetime.now(timezone.utc)
+        current_month = (now.year, now.month)
+
+        # Als we al data voor de huidige maand hebben, gebruik deze dan.
+        cached = _CACHE.get(url)
+        if cached is not None and _LAST_SUCCESS_MONTH.get(url) == current_month:
+            return cached
+
+        # Bepaal het minimale interval tussen fetches: dagelijks in de eerste vijf
+        # dagen van de maand, daarna maximaal wekelijks.
+        # Het interval wordt gemeten met de monotone klok, zodat een verzette
+        # systeemklok het niet beïnvloedt.
+        min_interval = 86400 if now.day <= 5 else 86400 * 7
+
+        last_attempt = _LAST_FETCH_ATTEMPT.get(url)
+        if (
+            last_attempt is not None
+            and time.monotonic() - last_attempt < min_interval - _INTERVAL_TOLERANCE
+        ):
+            return cached
+
+        result = {}
+        # Het totaal wordt tijdens het parsen opgebouwd; ``mask`` houdt bij
+        # welke waarden uit ``_TOTAAL_BITS`` al gevonden zijn.
+        total = 0.0
+        mask = 0
+        # Problemen tijdens het parsen worden verzameld en samen gelogd, zodat
+        # een gewijzigde PDF slechts één foutmelding per poging oplevert.
+        errors = []
+        try:
+            headers = {}
+            if cached is not None:
+                if _ETAG.get(url):
+                    headers["If-None-Match"] = _ETAG[url]
+                if _LAST_MODIFIED.get(url):
+                    headers["If-Modified-Since"] = _LAST_MODIFIED[url]
+
+            # Het tijdstip wordt vóór het verzoek genomen, zodat de duur van de
+            # download het volgende interval niet opschuift.
+            started = time.monotonic()
+            response = _SESSION.get(url, headers=headers, timeout=_REQUEST_TIMEOUT)
+            response.raise_for_status()
+
+            # Pas na een geslaagd verzoek telt de poging mee voor het interval,
+            # zodat een tijdelijke netwerkfout de volgende poging niet uitstelt.
+            _LAST_FETCH_ATTEMPT[url] = started
+
+            if response.status_code == 304:
+                _LOGGER.debug("PDF is niet gewijzigd, cache wordt gebruikt.")
+                return cached
+
+            pdf_bytes = response.content
+
+            # De tekst in de PDF is gecomprimeerd en dus niet rechtstreeks in de
+            # bytes te vinden, maar elke PDF begint met ``%PDF-`` (binnen de
+            # eerste 1024 bytes). Zo slaan we de dure tekstextractie over als de
+            # server bijvoorbeeld een HTML-foutpagina terugstuurt.
+            if b"%PDF-" not in pdf_bytes[:1024]:
+                _LOGGER.error(
+                    "Onverwacht antwoord, geen PDF ontvangen (Content-Type: %s).",
+                    response.headers.get("Content-Type"),
+                )
+                return cached
+
+            text, matches = _extract_text(pdf_bytes)
+
+            if not text:
+                _LOGGER.error("Geen tekst gevonden in de PDF.")
+                return cached
+
+            _LOGGER.debug("Extracted text: %s", text)
+
+            # Maandelijkse prijs: zoekt naar "Maandelijkse prijzen" gevolgd door een regel met getal
+            m_price = matches.get("mp")
+            if m_price:
                 try:
-                    zenne_index = netbeheerders.index("FLUVIUS ZENNE-DIJLE")
+                    waarde = _to_float(m_price.group("mp_waarde"))
+                    result["maandelijkse_prijs"] = waarde
+                    total += waarde
+                    mask |= _TOTAAL_BITS["maandelijkse_prijs"]
                 except ValueError:
-                    _LOGGER.error("FLUVIUS ZENNE-DIJLE niet gevonden tussen netbeheerders: %s", netbeheerders)
-                else:
-                    cijfers = [
-                        float(match.replace(',', '.'))
-                        for match in re.findall(r'\d+,\d+', block_text)
-                    ]
-                    kolom_grootte = len(netbeheerders)
-                    kolommen = [
-                        cijfers[i:i + kolom_grootte]
-                        for i in range(0, len(cijfers), kolom_grootte)
-                        if len(cijfers[i:i + kolom_grootte]) == kolom_grootte
-                    ]
-
+                    _LOGGER.debug("Kon de maandelijkse prijs niet omzetten: %s", m_price.group("mp_waarde"))
+                    errors.append("maandelijkse prijs niet omzetbaar")
+            else:
+                _LOGGER.debug("Geen maandelijkse prijs gevonden.")
+                errors.append("geen maandelijkse prijs")
+
+            # FLUVIUS ZENNE-DIJLE: pypdfium2 geeft de tabel rij per rij terug, zodat
+            # de acht waarden van de netbeheerder op dezelfde regel staan.
+            flz_row = matches.get("flz")
+            # Met pdfminer vermeldt de tabel eerst alle netbeheerders en daarna per
+            # kolom de waarden (één per netbeheerder). We zoeken dan naar het
+            # volledige blok met de acht FLUVIUS-netbeheerders en delen de
+            # daaropvolgende getallen in even grote stukken op.
+            flz_block = matches.get("flz_blok")
+            if flz_row is None and flz_block is not None:
+                flz_row = _RE_FLZ_ROW.search(flz_block.group("flz_blok"))
+            if flz_row:
+                waarden = [
+                    _to_float(match)
+                    for match in _RE_DECIMAL.findall(flz_row.group("flz_waarden"))
+                ]
+                result["fluvius_zenne_dijle_afname"] = waarden[3]
+                result["fluvius_zenne_dijle_vergoeding"] = waarden[7]
+                total += waarden[3]
+                mask |= _TOTAAL_BITS["fluvius_zenne_dijle_afname"]
+            elif flz_block:
+                block_text = flz_block.group("flz_blok")
+                netbeheerders = _RE_NETBEHEERDER.findall(block_text)
+                if netbeheerders:
                     try:
-                        result["fluvius_zenne_dijle_afname"] = kolommen[3][zenne_index]
-                    except IndexError:
-                        _LOGGER.error(
-                            "Onvoldoende kolommen gevonden voor FLUVIUS-afname: %s",
-                            kolommen,
-                        )
-
+                        zenne_index = netbeheerders.index("FLUVIUS ZENNE-DIJLE")
+                    except ValueError:
+                        _LOGGER.debug("FLUVIUS ZENNE-DIJLE niet gevonden tussen netbeheerders: %s", netbeheerders)
+                        errors.append("FLUVIUS ZENNE-DIJLE niet in distributieblok")
+                    else:
+                        cijfers = [
+                            _to_float(match)
+                            for match in _RE_DECIMAL.findall(block_text)
+                        ]
+                        kolom_grootte = len(netbeheerders)
+                        kolommen = [
+                            cijfers[i:i + kolom_grootte]
+                            for i in range(0, len(cijfers), kolom_grootte)
+                            if len(cijfers[i:i + kolom_grootte]) == kolom_grootte
+                        ]
+
+                        try:
+                            result["fluvius_zenne_dijle_afname"] = kolommen[3][zenne_index]
+                            total += kolommen[3][zenne_index]
+                            mask |= _TOTAAL_BITS["fluvius_zenne_dijle_afname"]
+                        except IndexError:
+                            _LOGGER.debug(
+                                "Onvoldoende kolommen gevonden voor FLUVIUS-afname: %s",
+                                kolommen,
+                            )
+                            errors.append("onvoldoende kolommen voor FLUVIUS-afname")
+
+                        try:
+                            result["fluvius_zenne_dijle_vergoeding"] = kolommen[7][zenne_index]
+                        except IndexError:
+                            _LOGGER.debug(
+                                "Onvoldoende kolommen gevonden voor FLUVIUS-vergoeding: %s",
+                                kolommen,
+                            )
+                            errors.append("onvoldoende kolommen voor FLUVIUS-vergoeding")
+                else:
+                    _LOGGER.debug("Geen FLUVIUS-netbeheerders gevonden in het distributieblok.")
+                    errors.append("geen FLUVIUS-netbeheerders")
+            else:
+                _LOGGER.debug("Distributieblok met FLUVIUS-netbeheerders niet gevonden.")
+                errors.append("geen distributieblok")
+
+            # Verwerk het toeslagen-blok: we zoeken naar het gedeelte na "Toeslagen (€cent/kWh)"
+            toeslagen_match = matches.get("ts")
+            if toeslagen_match:
+                numbers_in_block = _toeslagen_numbers(text, toeslagen_match)
+                _LOGGER.debug("Getallen in toeslagen-blok: %s", numbers_in_block)
+                if len(numbers_in_block) >= 2:
                     try:
-                        result["fluvius_zenne_dijle_vergoeding"] = kolommen[7][zenne_index]
-                    except IndexError:
-                        _LOGGER.error(
-                            "Onvoldoende kolommen gevonden voor FLUVIUS-vergoeding: %s",
-                            kolommen,
-                        )
+                        energiebijdrage = _to_float(numbers_in_block[0])
+                        result["energiebijdrage"] = energiebijdrage
+                        total += energiebijdrage
+                        mask |= _TOTAAL_BITS["energiebijdrage"]
+                        verbruik = _to_float(numbers_in_block[1])
+                        result["verbruik_0_12000"] = verbruik
+                        total += verbruik
+                        mask |= _TOTAAL_BITS["verbruik_0_12000"]
+                    except ValueError:
+                        _LOGGER.debug("Fout bij het omzetten van getallen in toeslagen-blok: %s", numbers_in_block)
+                        errors.append("getallen in toeslagen-blok niet omzetbaar")
+                else:
+                    _LOGGER.debug("Niet genoeg getallen gevonden in toeslagen-blok voor Energiebijdrage en Verbruik tussen 0 & 12.000 kWh.")
+                    errors.append("niet genoeg getallen in toeslagen-blok")
             else:
-                _LOGGER.error("Geen FLUVIUS-netbeheerders gevonden in het distributieblok.")
-        else:
-            _LOGGER.error("Distributieblok met FLUVIUS-netbeheerders niet gevonden.")
-
-        # Verwerk het toeslagen-blok: we zoeken naar het gedeelte na "Toeslagen (€cent/kWh)"
-        toeslagen_match = re.search(r'Toeslagen\s*\(.*?\)(.*)', text, re.DOTALL)
-        if toeslagen_match:
-            block = toeslagen_match.group(1)
-            lines = block.splitlines()
-            # Verzamel alleen lijnen die volledig bestaan uit cijfers en komma's
-            numbers_in_block = [line.strip() for line in lines if re.fullmatch(r'[\d,]+', line.strip())]
-            _LOGGER.debug("Getallen in toeslagen-blok: %s", numbers_in_block)
-            if len(numbers_in_block) >= 2:
-                try:
-                    result["energiebijdrage"] = float(numbers_in_block[0].replace(',', '.'))
-                    result["verbruik_0_12000"] = float(numbers_in_block[1].replace(',', '.'))
-                except ValueError:
-                    _LOGGER.error("Fout bij het omzetten van getallen in toeslagen-blok: %s", numbers_in_block)
+                _LOGGER.debug("Toeslagen-blok niet gevonden.")
+                errors.append("geen toeslagen-blok")
+
+            # Het totaal is enkel geldig als alle vereiste waarden gevonden zijn
+            if mask == _TOTAAL_MASK:
+                result["totaal"] = total
             else:
-                _LOGGER.error("Niet genoeg getallen gevonden in toeslagen-blok voor Energiebijdrage en Verbruik tussen 0 & 12.000 kWh.")
-        else:
-            _LOGGER.error("Toeslagen-blok niet gevonden.")
-
-        # Bereken totaal als alle vereiste waarden beschikbaar zijn
-        required_keys = [
-            "maandelijkse_prijs",
-            "fluvius_zenne_dijle_afname",
-            "energiebijdrage",
-            "verbruik_0_12000",
-        ]
-
-        missing_keys = [key for key in required_keys if key not in result]
-
-        if not missing_keys:
-            result["totaal"] = sum(result[key] for key in required_keys)
-        else:
-            _LOGGER.error(
-                "Niet alle waarden beschikbaar voor totaal berekening. Ontbrekend: %s",
-                ", ".join(missing_keys),
-            )
-
-        # Alleen bij een wijziging werken we de cache bij en noteren we dat de
-        # huidige maand succesvol is opgehaald. Zo proberen we dagelijks opnieuw
-        # tot de PDF daadwerkelijk verandert.
-        if result and result != _CACHE:
-            _CACHE = result
-            _LAST_SUCCESS_MONTH = current_month
-
-        return _CACHE
-
-    except Exception as e:
-        _LOGGER.error("Fout bij ophalen of parsen van de PDF: %s", e)
-        return _CACHE
-
-
-class EngieGasSensor(SensorEntity):
+                missing_keys = [key for key, bit in _TOTAAL_BITS.items() if not mask & bit]
+                errors.append("totaal niet berekend, ontbrekend: " + ", ".join(missing_keys))
+
+            if errors:
+                _LOGGER.error("Problemen bij het parsen van de PDF: %s", "; ".join(errors))
+
+            # Alleen bij een wijziging werken we de cache bij. De huidige maand
+            # geldt pas als succesvol opgehaald wanneer alle waarden gevonden
+            # zijn; een onvolledige PDF blokkeert zo geen nieuwe pogingen. Zo
+            # proberen we dagelijks opnieuw tot de PDF daadwerkelijk verandert.
+            all_present = _VALID_TYPES <= result.keys()
+            with _LOCK:
+                if result and result != cached:
+                    _CACHE[url] = result
+                    if all_present:
+                        _LAST_SUCCESS_MONTH[url] = current_month
+
+                # Onthoud de validators pas als er waarden uit deze PDF gehaald
+                # zijn, anders zou een 304 een mislukte parse voor altijd
+                # vastzetten.
+                if result:
+                    _ETAG[url] = response.headers.get("ETag")
+                    _LAST_MODIFIED[url] = response.headers.get("Last-Modified")
+
+            return _CACHE.get(url)
+
+        except Exception as e:
+            _LOGGER.error("Fout bij ophalen of parsen van de PDF: %s", e)
+            return cached
+
+
+def _url_lock(url):
+    """Geef de lock voor ``url`` terug en maak hem zo nodig aan."""
+    with _LOCK:
+        lock = _URL_LOCKS.get(url)
+        if lock is None:
+            lock = _URL_LOCKS[url] = threading.Lock()
+        return lock
+
+
+def _restore_cache(data):
+    """Vul de cache aan met de gegevens die op schijf bewaard zijn."""
+    with _LOCK:
+        for url, entry in data.items():
+            if url in _CACHE:
+                continue
+            _CACHE[url] = entry["cache"]
+            _LAST_SUCCESS_MONTH[url] = tuple(entry["month"])
+            _ETAG[url] = entry.get("etag")
+            _LAST_MODIFIED[url] = entry.get("last_modified")
+
+
+def _cache_snapshot():
+    """Geef de volledig opgehaalde maanden terug in een JSON-vriendelijke vorm."""
+    with _LOCK:
+        return {
+            url: {
+                "cache": _CACHE[url],
+                "month": list(month),
+                "etag": _ETAG.get(url),
+                "last_modified": _LAST_MODIFIED.get(url),
+            }
+            for url, month in _LAST_SUCCESS_MONTH.items()
+            if url in _CACHE
+        }
+
+
+async def _async_restore_store(hass):
+    """Lees de Store en vul de cache aan met de bewaarde gegevens."""
+    store = Store(hass, _STORE_VERSION, _STORE_KEY)
+    data = await store.async_load()
+    if data:
+        await hass.async_add_executor_job(_restore_cache, data)
+    return store
+
+
+async def _async_load_cache(hass):
+    """Laad de bewaarde cache eenmalig en geef de bijhorende Store terug.
+
+    Config entries worden gelijktijdig ingesteld; daarom bewaren we de
+    laadopdracht zelf en wacht elke aanroeper tot ze klaar is, zodat geen
+    entry begint op te halen voordat de cache hersteld is.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    load = domain_data.get("store_load")
+    if load is None:
+        load = hass.async_create_task(_async_restore_store(hass))
+        domain_data["store_load"] = load
+    return await load
+
+
+async def _async_parse_pdf(hass, url):
+    """Draai ``parse_pdf`` in de executor en bewaar een nieuwe maand op schijf."""
+    month_before = _LAST_SUCCESS_MONTH.get(url)
+    values = await hass.async_add_executor_job(parse_pdf, url)
+    if _LAST_SUCCESS_MONTH.get(url) != month_before:
+        store = await _async_load_cache(hass)
+        await store.async_save(await hass.async_add_executor_job(_cache_snapshot))
+    return values
+
+
+class EngieGasSensor(CoordinatorEntity, SensorEntity):
     """Sensor voor een specifiek getal uit de Engie PDF."""
 
-    def __init__(self, name, url, unique_id, sensor_type):
+    _NAMES = MappingProxyType({
+        "maandelijkse_prijs": "Maandelijkse Prijs",
+        "fluvius_zenne_dijle_afname": "FL Zenne-Dijle Afname",
+        "fluvius_zenne_dijle_vergoeding": "FL Zenne-Dijle Vergoeding",
+        "energiebijdrage": "Energiebijdrage",
+        "verbruik_0_12000": "Verbruik 0-12kWh",
+        "totaal": "Totaal",
+    })
+
+    _UNITS = MappingProxyType({
+        "maandelijkse_prijs": "€cent/kWh",
+        "fluvius_zenne_dijle_afname": "€cent/kWh",
+        "fluvius_zenne_dijle_vergoeding": "€cent/kWh",
+        "energiebijdrage": "€cent/kWh",
+        "verbruik_0_12000": "€cent/kWh",
+        "totaal": "€cent/kWh",
+    })
+
+    def __init__(self, coordinator, name, unique_id, sensor_type):
         """
         sensor_type moet één van de volgende zijn:
           - maandelijkse_prijs
@@ -196,29 +564,26 @@ class EngieGasSensor(SensorEntity):
           - verbruik_0_12000
           - totaal
         """
+        if sensor_type not in _VALID_TYPES:
+            raise ValueError(f"Onbekend sensor type: {sensor_type}")
+        super().__init__(coordinator)
         self._name = name
-        self._url = url
+        self._full_name = f"{name} {self._NAMES.get(sensor_type, sensor_type)}"
         self._unique_id = unique_id + "_" + sensor_type
         self._sensor_type = sensor_type
-        self._state = None
 
     @property
     def name(self):
         """Geef de sensor een duidelijke naam gebaseerd op het type."""
-        names = {
-            "maandelijkse_prijs": "Maandelijkse Prijs",
-            "fluvius_zenne_dijle_afname": "FL Zenne-Dijle Afname",
-            "fluvius_zenne_dijle_vergoeding": "FL Zenne-Dijle Vergoeding",
-            "energiebijdrage": "Energiebijdrage",
-            "verbruik_0_12000": "Verbruik 0-12kWh",
-            "totaal": "Totaal"
-        }
-        return f"{self._name} {names.get(self._sensor_type, self._sensor_type)}"
+        return self._full_name
 
     @property
     def state(self):
-        """De huidige waarde van de sensor."""
-        return self._state
+        """De huidige waarde van de sensor, zoals opgehaald door de coordinator."""
+        values = self.coordinator.data
+        if not values:
+            return None
+        return values.get(self._sensor_type)
 
     @property
     def unique_id(self):
@@ -243,36 +608,7 @@ class EngieGasSensor(SensorEntity):
     @property
     def unit_of_measurement(self):
         """Bepaal de eenheid op basis van het sensor_type."""
-        unit_mapping = {
-            "maandelijkse_prijs": "€cent/kWh",
-            "fluvius_zenne_dijle_afname": "€cent/kWh",
-            "fluvius_zenne_dijle_vergoeding": "€cent/kWh",
-            "energiebijdrage": "€cent/kWh",
-            "verbruik_0_12000": "€cent/kWh",
-            "totaal": "€cent/kWh",
-        }
-        return unit_mapping.get(self._sensor_type)
-
-    def update(self):
-        """Update de sensor door de PDF te downloaden en de gewenste waarden te parsen."""
-        values = parse_pdf(self._url)
-        if not values:
-            return
-
-        if self._sensor_type == "maandelijkse_prijs":
-            self._state = values.get("maandelijkse_prijs")
-        elif self._sensor_type == "fluvius_zenne_dijle_afname":
-            self._state = values.get("fluvius_zenne_dijle_afname")
-        elif self._sensor_type == "fluvius_zenne_dijle_vergoeding":
-            self._state = values.get("fluvius_zenne_dijle_vergoeding")
-        elif self._sensor_type == "energiebijdrage":
-            self._state = values.get("energiebijdrage")
-        elif self._sensor_type == "verbruik_0_12000":
-            self._state = values.get("verbruik_0_12000")
-        elif self._sensor_type == "totaal":
-            self._state = values.get("totaal")
-        else:
-            _LOGGER.error("Onbekend sensor type: %s", self._sensor_type)
+        return self._UNITS.get(self._sensor_type)
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
@@ -280,12 +616,26 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     name = config_entry.data.get(CONF_NAME, "Engie Prijzen")
     url = config_entry.data.get(CONF_URL)
     unique_id = config_entry.entry_id
+    await _async_load_cache(hass)
+
+    # Eén coordinator per config entry: ``parse_pdf`` draait één keer per
+    # interval in de executor en alle sensoren delen het resultaat.
+    coordinator = DataUpdateCoordinator(
+        hass,
+        _LOGGER,
+        config_entry=config_entry,
+        name=DOMAIN,
+        update_method=lambda: _async_parse_pdf(hass, url),
+        update_interval=SCAN_INTERVAL,
+    )
+    await coordinator.async_config_entry_first_refresh()
+
     entities = [
-        EngieGasSensor(name, url, unique_id, "maandelijkse_prijs"),
-        EngieGasSensor(name, url, unique_id, "fluvius_zenne_dijle_afname"),
-        EngieGasSensor(name, url, unique_id, "fluvius_zenne_dijle_vergoeding"),
-        EngieGasSensor(name, url, unique_id, "energiebijdrage"),
-        EngieGasSensor(name, url, unique_id, "verbruik_0_12000"),
-        EngieGasSensor(name, url, unique_id, "totaal"),
+        EngieGasSensor(coordinator, name, unique_id, "maandelijkse_prijs"),
+        EngieGasSensor(coordinator, name, unique_id, "fluvius_zenne_dijle_afname"),
+        EngieGasSensor(coordinator, name, unique_id, "fluvius_zenne_dijle_vergoeding"),
+        EngieGasSensor(coordinator, name, unique_id, "energiebijdrage"),
+        EngieGasSensor(coordinator, name, unique_id, "verbruik_0_12000"),
+        EngieGasSensor(coordinator, name, unique_id, "totaal"),
     ]
-    async_add_entities(entities, True)
+    async_add_entities(entities)